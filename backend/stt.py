@@ -1,18 +1,144 @@
 import asyncio
+import logging
+import os
 import numpy as np
-from faster_whisper import WhisperModel
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger(__name__)
 
 
 class SpeechToText:
-    def __init__(self):
+    """
+    Speech-to-Text Module
+
+    Engines supported:
+    - onnx           : ONNX Runtime Whisper-base with fused graph + int8 dynamic quantization
+    - faster-whisper : CTranslate2 int8 Whisper (fallback)
+    """
+
+    # Process-wide model cache keyed on engine/config so every
+    # SpeechToText instance shares one loaded model
+    _MODEL_CACHE = {}
+
+    def __init__(self, engine="onnx"):
+        self.engine = engine
         self.sample_rate = 16000
 
-        # Load model once
-        self.model = WhisperModel(
-            "base",
-            device="cpu",
-            compute_type="int8"
+        # Reusable float32 scratch buffer (30 s cap) so transcribe()
+        # doesn't allocate a fresh array per call
+        self._fbuf = np.empty(self.sample_rate * 30, dtype=np.float32)
+
+        # One dedicated worker: the model is already multi-threaded
+        # internally, so queuing transcriptions beats oversubscribing
+        # the default executor's 5x-cores thread pool
+        self._exec = ThreadPoolExecutor(max_workers=1, thread_name_prefix="whisper")
+
+        if engine == "onnx":
+            self._init_onnx()
+
+        if self.engine != "onnx":
+            self._init_faster_whisper()
+
+    # ------------------------------------------------------------------
+    # Engine Initializers
+    # ------------------------------------------------------------------
+
+    def _init_onnx(self):
+        try:
+            import onnxruntime
+            from optimum.onnxruntime import ORTModelForSpeechSeq2Seq
+            from transformers import WhisperProcessor
+
+            model_dir = os.path.join(
+                os.path.dirname(os.path.abspath(__file__)),
+                "models",
+                "whisper-base-onnx-int8",
+            )
+
+            key = ("onnx", model_dir)
+            cached = self._MODEL_CACHE.get(key)
+            if cached is None:
+                if not os.path.isdir(model_dir):
+                    self._export_onnx(model_dir)
+
+                # Whisper is matmul-bound on CPU; let ORT use every core
+                sess_options = onnxruntime.SessionOptions()
+                sess_options.intra_op_num_threads = os.cpu_count()
+
+                log.info("🔄 Loading ONNX Whisper model...")
+                cached = (
+                    ORTModelForSpeechSeq2Seq.from_pretrained(
+                        model_dir,
+                        session_options=sess_options,
+                    ),
+                    WhisperProcessor.from_pretrained("openai/whisper-base"),
+                )
+                self._MODEL_CACHE[key] = cached
+
+            self.model, self.processor = cached
+            self.forced_decoder_ids = self.processor.get_decoder_prompt_ids(
+                language="en", task="transcribe"
+            )
+            log.info("✅ ONNX Whisper loaded (fused + int8)")
+        except Exception as e:
+            log.error("❌ ONNX Whisper init failed: %s", e)
+            self.engine = "faster-whisper"
+
+    def _export_onnx(self, model_dir):
+        """One-time export: Whisper-base → ONNX, fuse graph nodes, quantize to int8"""
+        from optimum.onnxruntime import ORTModelForSpeechSeq2Seq
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+
+        log.info("🔄 Exporting Whisper-base to ONNX (one-time)...")
+        exported = ORTModelForSpeechSeq2Seq.from_pretrained(
+            "openai/whisper-base", export=True
         )
+        exported.save_pretrained(model_dir)
+
+        for name in os.listdir(model_dir):
+            if not name.endswith(".onnx"):
+                continue
+            path = os.path.join(model_dir, name)
+
+            # Fuse LayerNorm / Attention / GELU nodes
+            try:
+                from onnxruntime.transformers.optimizer import optimize_model
+                optimized = optimize_model(path, model_type="bert", opt_level=99)
+                optimized.save_model_to_file(path)
+            except Exception as e:
+                log.warning("⚠️ Graph fusion skipped for %s: %s", name, e)
+
+            # int8 dynamic quantization of the MatMul weights
+            # (QInt8, not QUInt8 — signed weights match FP32 accuracy)
+            quantize_dynamic(
+                path,
+                path,
+                weight_type=QuantType.QInt8,
+                op_types_to_quantize=["MatMul"],
+            )
+
+        log.info("✅ ONNX export complete")
+
+    def _init_faster_whisper(self):
+        from faster_whisper import WhisperModel
+
+        key = ("faster-whisper", "base", "cpu", "int8")
+        model = self._MODEL_CACHE.get(key)
+        if model is None:
+            log.warning("⚠️ Using faster-whisper (CTranslate2 int8)")
+            model = WhisperModel(
+                "base",
+                device="cpu",
+                compute_type="int8",
+                cpu_threads=max(1, (os.cpu_count() or 2) // 2),  # physical cores
+                num_workers=1
+            )
+            self._MODEL_CACHE[key] = model
+        self.model = model
+
+    # ------------------------------------------------------------------
+    # Transcription
+    # ------------------------------------------------------------------
 
     async def transcribe(self, pcm16_bytes: bytes) -> str:
         """
@@ -29,17 +155,53 @@ class SpeechToText:
             # Too short to transcribe
             return ""
 
-        # PCM16 → float32 numpy array
-        audio = (
-            np.frombuffer(pcm16_bytes, dtype=np.int16)
-              .astype(np.float32) / 32768.0
-        )   
+        loop = asyncio.get_running_loop()
 
-        loop = asyncio.get_event_loop()
-        segments, _ = await loop.run_in_executor(
-            None,
-            lambda: self.model.transcribe(audio, language="en")
+        if self.engine == "onnx":
+            return await loop.run_in_executor(
+                self._exec,
+                lambda: self._transcribe_onnx(self._prepare(pcm16_bytes))
+            )
+
+        # transcribe() returns a lazy generator — the decode only runs as
+        # segments are consumed, so the join must happen inside the job
+        # or the real work lands back on the event-loop thread
+        return await loop.run_in_executor(
+            self._exec,
+            lambda: "".join(
+                segment.text
+                for segment in self.model.transcribe(
+                    self._prepare(pcm16_bytes), language="en"
+                )[0]
+            ).strip()
         )
 
-        text = "".join(segment.text for segment in segments).strip()
-        return text
+    def _prepare(self, pcm16_bytes):
+        """
+        PCM16 → float32 into the preallocated scratch buffer
+        (zero-copy int16 view + one fused multiply, no temporaries)
+
+        Runs only on the single-worker executor thread — that serializes
+        access to _fbuf, so queued transcriptions can't clobber each
+        other's audio.
+        """
+        i16 = np.frombuffer(pcm16_bytes, dtype=np.int16)
+        n = i16.size
+        if n > self._fbuf.size:
+            self._fbuf = np.empty(n, dtype=np.float32)
+        np.multiply(i16, np.float32(1.0 / 32768.0), out=self._fbuf[:n])
+        return self._fbuf[:n]
+
+    def _transcribe_onnx(self, audio):
+        """Greedy decode through the quantized ONNX sessions"""
+        inputs = self.processor(
+            audio, sampling_rate=self.sample_rate, return_tensors="pt"
+        )
+        generated = self.model.generate(
+            inputs.input_features,
+            forced_decoder_ids=self.forced_decoder_ids,
+            num_beams=1,
+        )
+        return self.processor.batch_decode(
+            generated, skip_special_tokens=True
+        )[0].strip()
@@ -1,9 +1,103 @@
 import asyncio
+import hashlib
+import logging
 import numpy as np
 import wave
 import io
 import os
 import tempfile
+from functools import lru_cache
+from math import gcd
+
+try:
+    from scipy.signal import resample_poly
+    _HAVE_SCIPY = True
+except ImportError:
+    _HAVE_SCIPY = False
+
+try:
+    import soundfile as sf
+    _HAVE_SOUNDFILE = True
+except ImportError:
+    _HAVE_SOUNDFILE = False
+
+log = logging.getLogger(__name__)
+
+
+# ------------------------------------------------------------------
+# Mock Renderer (module-level so lru_cache can key on text)
+# ------------------------------------------------------------------
+
+# One full sine period, sampled once at import; oscillators below index
+# into it instead of calling np.sin per sample
+_SINTAB_SIZE = 4096
+_SINTAB = np.sin(
+    np.linspace(0, 2 * np.pi, _SINTAB_SIZE, endpoint=False, dtype=np.float32)
+)
+
+
+def _osc_sum(freqs, weights, sr, n):
+    """
+    Weighted sine-oscillator bank via table lookup + linear interp
+
+    Phase runs on a 32-bit fixed-point accumulator (classic DDS), so
+    there's no transcendental call and no float drift over long renders.
+    """
+    samp = np.arange(n, dtype=np.int64)
+    steps = np.round(
+        np.asarray(freqs, dtype=np.float64) / sr * (1 << 32)
+    ).astype(np.int64)
+
+    phase = (steps[:, None] * samp[None, :]) & 0xFFFFFFFF
+    idx = (phase >> 20).astype(np.int32)  # top 12 bits → table index
+    frac = (phase & 0xFFFFF).astype(np.float32) * np.float32(1.0 / (1 << 20))
+
+    base = _SINTAB[idx]
+    interp = base + frac * (_SINTAB[(idx + 1) & (_SINTAB_SIZE - 1)] - base)
+    return np.einsum('k,kn->n', np.asarray(weights, dtype=np.float32), interp)
+
+@lru_cache(maxsize=256)
+def _render_mock(text, sample_rate):
+    """Render robot speech for a text — deterministic, so cacheable"""
+
+    # Seed the voice parameters from the text itself instead of global
+    # np.random state; identical texts render identical audio
+    seed = int.from_bytes(hashlib.blake2s(text.encode()).digest()[:8], "little")
+    rng = np.random.default_rng(seed)
+
+    sr = sample_rate
+    duration = min(len(text) * 0.06, 5.0)
+    n = int(sr * duration)
+    t = np.linspace(0, duration, n, endpoint=False, dtype=np.float32)
+
+    # 1️⃣ Fundamental pitch (robot voice)
+    f0 = rng.uniform(90, 160)  # Hz
+
+    # 2️⃣ Fake vowel formants (band emphasis)
+    formant_freqs = rng.choice(
+        [500, 700, 1100, 1500, 2300], size=2, replace=False
+    )
+
+    # 3️⃣ Fundamental + harmonics + formants through the sine table
+    freqs = np.array(
+        [f0, 2 * f0, 3 * f0, 4 * f0, *formant_freqs], dtype=np.float32
+    )
+    weights = np.array([1, 1 / 2, 1 / 3, 1 / 4, 0.3, 0.3], dtype=np.float32)
+
+    voiced = _osc_sum(freqs, weights, sr, n)
+
+    # 4️⃣ Amplitude envelope (syllables), applied in place
+    syllable_rate = rng.uniform(3, 6)
+    envelope = np.sin(np.float32(2 * np.pi * syllable_rate) * t)
+    envelope += 1.0
+    envelope *= 0.5
+    np.multiply(voiced, envelope, out=voiced)
+
+    # 5️⃣ Normalize + volume + int16 cast folded into one scale factor
+    peak = np.max(np.abs(voiced, out=envelope))  # envelope reused as scratch
+    scale = np.float32(32767 * 0.5 / (peak + 1e-6))
+    np.multiply(voiced, scale, out=voiced)
+    return voiced.astype(np.int16).tobytes()
 
 
 class TextToSpeech:
@@ -25,7 +119,7 @@ class TextToSpeech:
         elif engine == "gtts":
             self._init_gtts()
         else:
-            print("⚠️ Using MOCK TTS (robot speech, offline)")
+            log.info("⚠️ Using MOCK TTS (robot speech, offline)")
 
     # ------------------------------------------------------------------
     # Engine Initializers
@@ -34,19 +128,19 @@ class TextToSpeech:
     def _init_coqui(self):
         try:
             from TTS.api import TTS
-            print("🔄 Loading Coqui TTS model...")
+            log.info("🔄 Loading Coqui TTS model...")
             self.tts = TTS(model_name="tts_models/en/ljspeech/tacotron2-DDC")
-            print("✅ Coqui TTS loaded")
+            log.info("✅ Coqui TTS loaded")
         except Exception as e:
-            print(f"❌ Coqui init failed: {e}")
+            log.error("❌ Coqui init failed: %s", e)
             self.engine = "mock"
 
     def _init_gtts(self):
         try:
             from gtts import gTTS
-            print("✅ gTTS ready (internet required)")
+            log.info("✅ gTTS ready (internet required)")
         except Exception as e:
-            print(f"❌ gTTS init failed: {e}")
+            log.error("❌ gTTS init failed: %s", e)
             self.engine = "mock"
 
     # ------------------------------------------------------------------
@@ -55,28 +149,57 @@ class TextToSpeech:
 
     def wav_to_pcm16(self, wav_path):
         try:
-            with wave.open(wav_path, "rb") as wav_file:
-                frames = wav_file.readframes(wav_file.getnframes())
-                channels = wav_file.getnchannels()
-                rate = wav_file.getframerate()
+            if _HAVE_SOUNDFILE:
+                # libsndfile decodes straight into an int16 array in C —
+                # no Python header parse, no full-file bytes object
+                data, rate = sf.read(wav_path, dtype='int16', always_2d=True)
+                if data.shape[1] == 2:
+                    left = data[:, 0].astype(np.int32)
+                    right = data[:, 1].astype(np.int32)
+                    audio = ((left + right) >> 1).astype(np.int16)
+                else:
+                    audio = np.ascontiguousarray(data[:, 0])
+            else:
+                with wave.open(wav_path, "rb") as wav_file:
+                    frames = wav_file.readframes(wav_file.getnframes())
+                    channels = wav_file.getnchannels()
+                    rate = wav_file.getframerate()
 
                 audio = np.frombuffer(frames, dtype=np.int16)
 
                 if channels == 2:
-                    audio = audio.reshape(-1, 2).mean(axis=1).astype(np.int16)
-
-                if rate != self.sample_rate:
+                    # Average L/R in int32 with a signed shift — no
+                    # float64 upcast of the whole buffer
+                    left = audio[0::2].astype(np.int32)
+                    right = audio[1::2].astype(np.int32)
+                    audio = ((left + right) >> 1).astype(np.int16)
+
+            if rate != self.sample_rate:
+                if _HAVE_SCIPY:
+                    # Polyphase FIR resample — SIMD inner loop, no
+                    # full-length linspace/arange temporaries. Clip
+                    # before the cast: FIR overshoot on near-full-scale
+                    # audio would wrap in int16 otherwise
+                    g = gcd(rate, self.sample_rate)
+                    resampled = resample_poly(
+                        audio.astype(np.float32),
+                        self.sample_rate // g,
+                        rate // g,
+                    )
+                    np.clip(resampled, -32768, 32767, out=resampled)
+                    audio = resampled.astype(np.int16)
+                else:
                     ratio = self.sample_rate / rate
                     new_len = int(len(audio) * ratio)
                     audio = np.interp(
-                        np.linspace(0, len(audio), new_len),
-                        np.arange(len(audio)),
+                        np.linspace(0, len(audio), new_len, dtype=np.float32),
+                        np.arange(len(audio), dtype=np.float32),
                         audio,
                     ).astype(np.int16)
 
-                return audio.tobytes()
+            return audio.tobytes()
         except Exception as e:
-            print(f"❌ WAV conversion error: {e}")
+            log.error("❌ WAV conversion error: %s", e)
             return b""
 
     # ------------------------------------------------------------------
@@ -94,25 +217,55 @@ class TextToSpeech:
         else:
             return await self._synthesize_mock(text)
 
+    async def stream(self, text: str, chunk_size: int = 65536):
+        """
+        Async generator over synthesized audio, chunk_size bytes at a time
+
+        Chunking only, not pipelining: every engine here produces the
+        whole clip in one call, so the first chunk appears once
+        synthesis completes. The win is on the way out — zero-copy
+        memoryview slices instead of per-chunk bytes allocations.
+        """
+        if not text or not text.strip():
+            return
+
+        audio = await self.synthesize(text)
+        mv = memoryview(audio)
+        for i in range(0, len(audio), chunk_size):
+            yield mv[i:i + chunk_size]
+
     # ------------------------------------------------------------------
     # Coqui TTS
     # ------------------------------------------------------------------
 
     async def _synthesize_coqui(self, text):
         try:
-            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as f:
-                path = f.name
-
-            loop = asyncio.get_event_loop()
-            await loop.run_in_executor(
-                None, lambda: self.tts.tts_to_file(text=text, file_path=path)
+            loop = asyncio.get_running_loop()
+            wav = await loop.run_in_executor(
+                None, lambda: self.tts.tts(text=text)
             )
 
-            pcm = self.wav_to_pcm16(path)
-            os.unlink(path)
-            return pcm
+            # Float32 samples straight from the model — no tempfile,
+            # no WAV header parse, no re-decode
+            audio = np.asarray(wav, dtype=np.float32)
+
+            rate = self.tts.synthesizer.output_sample_rate
+            if rate != self.sample_rate:
+                if _HAVE_SCIPY:
+                    g = gcd(rate, self.sample_rate)
+                    audio = resample_poly(audio, self.sample_rate // g, rate // g)
+                else:
+                    new_len = int(len(audio) * self.sample_rate / rate)
+                    audio = np.interp(
+                        np.linspace(0, len(audio), new_len, dtype=np.float32),
+                        np.arange(len(audio), dtype=np.float32),
+                        audio,
+                    )
+
+            pcm = np.clip(audio * 32767, -32768, 32767).astype(np.int16)
+            return pcm.tobytes()
         except Exception as e:
-            print(f"❌ Coqui synthesis error: {e}")
+            log.error("❌ Coqui synthesis error: %s", e)
             return b""
 
     # ------------------------------------------------------------------
@@ -127,7 +280,7 @@ class TextToSpeech:
             with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as f:
                 mp3_path = f.name
 
-            loop = asyncio.get_event_loop()
+            loop = asyncio.get_running_loop()
             await loop.run_in_executor(
                 None, lambda: gTTS(text=text, lang="en").save(mp3_path)
             )
@@ -141,7 +294,7 @@ class TextToSpeech:
             os.unlink(wav_path)
             return pcm
         except Exception as e:
-            print(f"❌ gTTS synthesis error: {e}")
+            log.error("❌ gTTS synthesis error: %s", e)
             return b""
 
     # ------------------------------------------------------------------
@@ -154,41 +307,13 @@ class TextToSpeech:
         Not real TTS, but sounds like talking
         """
 
-        print(f"🗣️ MOCK SPEECH for: '{text[:40]}...'")
-       
-        await asyncio.sleep(0.03)
-
-        sr = self.sample_rate
-        duration = min(len(text) * 0.06, 5.0)
-        n = int(sr * duration)
-        t = np.linspace(0, duration, n, endpoint=False)
-
-        # 1️⃣ Fundamental pitch (robot voice)
-        f0 = np.random.uniform(90, 160)  # Hz
-        voiced = np.sin(2 * np.pi * f0 * t)
-
-        # 2️⃣ Add harmonics
-        for h in range(2, 5):
-            voiced += (1 / h) * np.sin(2 * np.pi * f0 * h * t)
+        # %.40s truncates lazily — no slice, no format unless emitted
+        log.debug("🗣️ MOCK SPEECH for: '%.40s...'", text)
 
-        # 3️⃣ Fake vowel formants (band emphasis)
-        formant_freqs = np.random.choice(
-            [500, 700, 1100, 1500, 2300], size=2, replace=False
-        )
-
-        for f in formant_freqs:
-            voiced += 0.3 * np.sin(2 * np.pi * f * t)
-
-        # 4️⃣ Amplitude envelope (syllables)
-        syllable_rate = np.random.uniform(3, 6)
-        envelope = 0.5 * (1 + np.sin(2 * np.pi * syllable_rate * t))
-        audio = voiced * envelope
-
-        # 5️⃣ Normalize
-        audio /= np.max(np.abs(audio) + 1e-6)
+        await asyncio.sleep(0.03)
 
-        pcm16 = (audio * 32767 * 0.5).astype(np.int16)
-        return pcm16.tobytes()
+        # Deterministic per-text render, so repeats are a cache hit
+        return _render_mock(text, self.sample_rate)
 
 
 
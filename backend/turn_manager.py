@@ -1,6 +1,11 @@
+import itertools
+import logging
+from datetime import datetime
 from enum import Enum
 from collections import deque
 
+log = logging.getLogger(__name__)
+
 class Turn(Enum):
     """Turn states"""
     USER = "user"
@@ -16,8 +21,8 @@ class TurnManager:
     def __init__(self):
         self.current_turn = Turn.USER
         self.user_audio_buffer = deque()
-        self.turn_history = []
-        print("✅ TurnManager initialized")
+        self.turn_history = deque(maxlen=128)  # bounded — long sessions can't leak
+        log.info("✅ TurnManager initialized")
     
     def is_user_turn(self):
         """Check if it's the user's turn to speak"""
@@ -65,7 +70,10 @@ class TurnManager:
         """Reset turn manager state"""
         self.current_turn = Turn.USER
         self.user_audio_buffer.clear()
-        print("🔄 TurnManager reset")
+        # Instances are pooled across connections — the history must not
+        # carry one client's turn records into the next
+        self.turn_history.clear()
+        log.debug("🔄 TurnManager reset")
     
     def _log_turn_change(self, turn_name):
         """Log turn changes for debugging"""
@@ -73,17 +81,21 @@ class TurnManager:
             "turn": turn_name,
             "timestamp": self._get_timestamp()
         })
-        print(f"🔄 Turn changed to: {turn_name}")
+        log.debug("🔄 Turn changed to: %s", turn_name)
     
+    # Bound once at class creation — no per-call import or attr lookup
+    _now = staticmethod(datetime.now)
+
     def _get_timestamp(self):
         """Get current timestamp"""
-        from datetime import datetime
-        return datetime.now().isoformat()
+        return self._now().isoformat()
     
     def get_state(self):
         """Get current state for debugging"""
         return {
             "current_turn": self.current_turn.value,
             "buffered_chunks": len(self.user_audio_buffer),
-            "recent_turns": self.turn_history[-5:] if self.turn_history else []
+            "recent_turns": list(itertools.islice(
+                self.turn_history, max(0, len(self.turn_history) - 5), None
+            ))
         }
\ No newline at end of file
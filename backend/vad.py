@@ -1,6 +1,43 @@
+import bisect
+import logging
+import math
 import numpy as np
 from collections import deque
 
+log = logging.getLogger(__name__)
+
+try:
+    from numba import njit
+    _HAVE_NUMBA = True
+except ImportError:
+    _HAVE_NUMBA = False
+
+
+def _frame_energies_np(pcm_i16, frame_size):
+    """Per-frame RMS for every complete frame in pcm_i16 (vectorized fallback)"""
+    n_frames = pcm_i16.size // frame_size
+    frames = pcm_i16[:n_frames * frame_size].reshape(n_frames, frame_size)
+    ssq = np.einsum('ij,ij->i', frames, frames, dtype=np.int64)
+    return (np.sqrt(ssq / frame_size) / 32768.0).astype(np.float32)
+
+
+if _HAVE_NUMBA:
+    @njit(cache=True, fastmath=True)
+    def _frame_energies(pcm_i16, frame_size):
+        """Per-frame RMS, single compiled pass with an integer accumulator"""
+        n_frames = pcm_i16.size // frame_size
+        out = np.empty(n_frames, dtype=np.float32)
+        for k in range(n_frames):
+            base = k * frame_size
+            acc = np.int64(0)
+            for i in range(frame_size):
+                s = np.int64(pcm_i16[base + i])
+                acc += s * s
+            out[k] = math.sqrt(acc / frame_size) / 32768.0
+        return out
+else:
+    _frame_energies = _frame_energies_np
+
 class VoiceActivityDetector:
     """
     Voice Activity Detection (VAD) - Detects when speech is present in audio
@@ -27,15 +64,33 @@ class VoiceActivityDetector:
         
         # Buffers and state
         self.audio_buffer = bytearray()
-        self.speech_buffer = bytearray()       # Accumulate speech frames
+        # Preallocated speech store (30 s cap) with a write cursor —
+        # no incremental bytearray growth while an utterance accumulates
+        self._speech = np.zeros(sample_rate * 30, dtype=np.int16)
+        self._sp_cursor = 0
         self.pre_speech_buffer = deque(maxlen=pre_roll_frames)  # Pre-roll frames
         self.energy_history = deque(maxlen=50)
+        self._sorted_energy = []           # sorted mirror of energy_history for O(log n) median
         
         self.is_speaking = False
         self.speech_frames = 0
         self.silence_frames = 0
-        
-        print(f"✅ VAD initialized: threshold={energy_threshold}, frame_size={self.frame_size}")
+
+        # Prefer WebRTC's C decision function over the Python energy
+        # heuristic when the package is installed (10/20/30 ms frames only)
+        self._webrtc = None
+        if frame_duration_ms in (10, 20, 30):
+            try:
+                import webrtcvad
+                self._webrtc = webrtcvad.Vad(2)
+                log.info("✅ VAD using webrtcvad (C decision path)")
+            except ImportError:
+                pass
+
+        log.info(
+            "✅ VAD initialized: threshold=%s, frame_size=%s",
+            energy_threshold, self.frame_size,
+        )
     
     def calculate_energy(self, audio_data):
         """Calculate RMS energy of audio frame"""
@@ -43,80 +98,115 @@ class VoiceActivityDetector:
             audio_array = np.frombuffer(audio_data, dtype=np.int16)
             if len(audio_array) == 0:
                 return 0.0
-            float_audio = audio_array.astype(np.float32) / 32768.0
-            energy = np.sqrt(np.mean(float_audio ** 2))
-            return energy
+            # Sum of squares in integer SIMD, rescale once at the end —
+            # no float32 copy of the frame
+            ssq = np.einsum('i,i->', audio_array, audio_array, dtype=np.int64)
+            return math.sqrt(ssq / audio_array.size) / 32768.0
         except Exception as e:
-            print(f"⚠️ Energy calculation error: {e}")
+            log.warning("⚠️ Energy calculation error: %s", e)
             return 0.0
     
-    def _process_frame(self, frame):
+    def _process_frame(self, frame, energy=None):
         """Process a single frame and detect speech"""
-        energy = self.calculate_energy(frame)
+        if energy is None:
+            energy = self.calculate_energy(frame)
+        if len(self.energy_history) == self.energy_history.maxlen:
+            # Oldest sample is about to be evicted — drop it from the mirror
+            evicted = self.energy_history[0]
+            del self._sorted_energy[bisect.bisect_left(self._sorted_energy, evicted)]
         self.energy_history.append(energy)
-        
-        # Adaptive threshold based on recent energies
-        if len(self.energy_history) > 10:
-            noise_floor = np.median(self.energy_history)
-            threshold = max(self.energy_threshold, noise_floor * 1.5)
+        bisect.insort(self._sorted_energy, energy)
+
+        if self._webrtc is not None:
+            is_speech_frame = self._webrtc.is_speech(frame, self.sample_rate)
         else:
-            threshold = self.energy_threshold
-        
+            # Adaptive threshold based on recent energies
+            # (middle element of the sorted mirror — no per-frame np.median)
+            if len(self._sorted_energy) > 10:
+                noise_floor = self._sorted_energy[len(self._sorted_energy) // 2]
+                threshold = max(self.energy_threshold, noise_floor * 1.5)
+            else:
+                threshold = self.energy_threshold
+            is_speech_frame = energy > threshold
+
         # Always store frame in pre-roll
         self.pre_speech_buffer.append(frame)
-        
-        if energy > threshold:
-            self.speech_frames += 1
-            self.silence_frames = 0
-            
+
+        # Branchless counter update — one counter runs, the other resets,
+        # without a data-dependent branch on every frame
+        is_sp = int(is_speech_frame)
+        self.speech_frames = (self.speech_frames + 1) * is_sp
+        self.silence_frames = (self.silence_frames + 1) * (1 - is_sp)
+
+        # Only the state-transition edges branch
+        if is_sp:
             # Speech just started
             if not self.is_speaking and self.speech_frames >= self.speech_frames_threshold:
                 self.is_speaking = True
                 # Add pre-roll frames to speech buffer
                 for f in self.pre_speech_buffer:
-                    self.speech_buffer.extend(f)
+                    self._append_speech(f)
                 self.pre_speech_buffer.clear()
-                print(f"🎤 Speech started (energy={energy:.4f})")
-            
+                log.debug("🎤 Speech started (energy=%.4f)", energy)
+
             # Add current frame to speech buffer if speaking
             if self.is_speaking:
-                self.speech_buffer.extend(frame)
-            
+                self._append_speech(frame)
+
             return False, None
-        
-        else:
-            # Silence frame
-            self.silence_frames += 1
-            if not self.is_speaking:
-                self.speech_frames = 0  # reset if not speaking
-            
-            if self.is_speaking:
-                self.speech_buffer.extend(frame)
-            
-            if self.is_speaking and self.silence_frames >= self.silence_frames_threshold:
+
+        # Silence frame
+        if self.is_speaking:
+            self._append_speech(frame)
+
+            if self.silence_frames >= self.silence_frames_threshold:
                 self.is_speaking = False
-                print("🔇 Speech ended")
-                speech_data = bytes(self.speech_buffer)
-                self.speech_buffer.clear()
+                log.debug("🔇 Speech ended")
+                speech_data = self._speech[:self._sp_cursor].tobytes()
+                self._sp_cursor = 0
                 self.speech_frames = 0
                 self.pre_speech_buffer.clear()
                 return True, speech_data
-            
+
         return False, None
-    
+
+    def _append_speech(self, frame):
+        """Copy a PCM16 frame into the preallocated speech store"""
+        n = len(frame) // 2
+        end = min(self._sp_cursor + n, self._speech.size)  # clamp at the 30 s cap
+        if end > self._sp_cursor:
+            self._speech[self._sp_cursor:end] = np.frombuffer(
+                frame, dtype=np.int16, count=end - self._sp_cursor
+            )
+            self._sp_cursor = end
+
     def process_audio(self, audio_bytes):
         """Process incoming audio chunk (may contain multiple frames)"""
         self.audio_buffer.extend(audio_bytes)
         frame_bytes = self.frame_size * 2  # PCM16 = 2 bytes per sample
         speech_chunks = []
-        
-        while len(self.audio_buffer) >= frame_bytes:
-            frame = bytes(self.audio_buffer[:frame_bytes])
-            self.audio_buffer = self.audio_buffer[frame_bytes:]
-            
-            ended, speech_data = self._process_frame(frame)
-            if ended and speech_data:
-                speech_chunks.append(speech_data)
+
+        # Compute every frame energy in one kernel call up front;
+        # the Python loop below only drives the state machine
+        n_frames = len(self.audio_buffer) // frame_bytes
+        if n_frames:
+            pcm = np.frombuffer(
+                bytes(self.audio_buffer[:n_frames * frame_bytes]), dtype=np.int16
+            )
+            energies = _frame_energies(pcm, self.frame_size)
+
+        # Walk the buffer with a cursor; one tail-copy per chunk, not per frame
+        read_pos = 0
+        with memoryview(self.audio_buffer) as mv:
+            for frame_idx in range(n_frames):
+                frame = bytes(mv[read_pos:read_pos + frame_bytes])
+                read_pos += frame_bytes
+
+                ended, speech_data = self._process_frame(frame, energies[frame_idx])
+                if ended and speech_data:
+                    speech_chunks.append(speech_data)
+        if read_pos:
+            del self.audio_buffer[:read_pos]
         
         # Return last speech chunk if any ended
         if speech_chunks:
@@ -128,12 +218,12 @@ class VoiceActivityDetector:
     
     def clear_buffer(self):
         self.audio_buffer.clear()
-        self.speech_buffer.clear()
+        self._sp_cursor = 0
         self.pre_speech_buffer.clear()
         self.speech_frames = 0
         self.silence_frames = 0
         self.is_speaking = False
-        print("🧹 VAD buffer cleared")
+        log.debug("🧹 VAD buffer cleared")
     
     def get_stats(self):
         return {
@@ -141,6 +231,6 @@ class VoiceActivityDetector:
             "speech_frames": self.speech_frames,
             "silence_frames": self.silence_frames,
             "buffer_size": len(self.audio_buffer),
-            "speech_buffer_size": len(self.speech_buffer),
+            "speech_buffer_size": self._sp_cursor * 2,
             "recent_energy": list(self.energy_history)[-5:] if self.energy_history else []
         }
@@ -66,9 +66,21 @@ startBtn.onclick = async () => {
         return;
       }
 
-      // 2️⃣ Handle binary audio ONLY
+      // 2️⃣ Handle binary frames (first byte is the frame tag)
       if (event.data instanceof ArrayBuffer) {
-        playAudioNew(event.data);
+        const tag = new Uint8Array(event.data, 0, 1)[0];
+        const payload = event.data.slice(1);
+
+        if (tag === 0x01) {
+          // Raw PCM16 audio
+          playAudioNew(payload);
+        } else if (tag === 0x02) {
+          // msgpack transcript with one-char keys
+          const m = decodeMsgpackMap(payload);
+          handleJsonMessage({ type: "transcript", role: m.r, text: m.x });
+        } else {
+          console.log("❓ Unknown binary frame tag:", tag);
+        }
       }
     };
 
@@ -269,6 +281,42 @@ function handleJsonMessage(data) {
 
 // ======== Helper Functions ========
 
+// Minimal msgpack decoder for the transcript frames the backend sends
+// (flat fixmap of strings — fixstr / str8 / str16 only)
+function decodeMsgpackMap(buffer) {
+  const bytes = new Uint8Array(buffer);
+  const textDecoder = new TextDecoder();
+  let pos = 0;
+
+  function readString() {
+    const head = bytes[pos++];
+    let len;
+    if ((head & 0xe0) === 0xa0) {
+      len = head & 0x1f; // fixstr
+    } else if (head === 0xd9) {
+      len = bytes[pos++]; // str8
+    } else if (head === 0xda) {
+      len = (bytes[pos] << 8) | bytes[pos + 1]; // str16
+      pos += 2;
+    } else {
+      throw new Error("unsupported msgpack type: " + head);
+    }
+    const s = textDecoder.decode(bytes.subarray(pos, pos + len));
+    pos += len;
+    return s;
+  }
+
+  const head = bytes[pos++];
+  if ((head & 0xf0) !== 0x80) throw new Error("expected msgpack fixmap");
+  const size = head & 0x0f;
+  const obj = {};
+  for (let i = 0; i < size; i++) {
+    const key = readString();
+    obj[key] = readString();
+  }
+  return obj;
+}
+
 // Convert Float32 to PCM16
 function float32ToPCM16(float32Array) {
   const pcm16 = new Int16Array(float32Array.length);